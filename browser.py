@@ -1,9 +1,21 @@
-from playwright.async_api import async_playwright, Browser, Page
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from contextlib import asynccontextmanager
+import asyncio
 import logging
 import config
 
 logger = logging.getLogger(__name__)
 
+# Number of pre-warmed pages kept in the pool
+PAGE_POOL_SIZE = 4
+
+# How long to wait for the page to render some text (ms)
+PAGE_RENDER_TIMEOUT = 5000
+
+# How long the networkidle fallback may wait (ms)
+NETWORK_IDLE_TIMEOUT = 5000
+
 
 class BrowserManager:
     """Manages Playwright browser for rendering JavaScript pages"""
@@ -11,60 +23,127 @@ class BrowserManager:
     def __init__(self):
         self.playwright = None
         self.browser: Browser = None
-        self.page: Page = None
+        self._context: BrowserContext = None
+        self._pages: asyncio.Queue = None
     
     async def start(self):
-        """Initialize browser"""
+        """Initialize browser, a shared context and a pool of pages"""
         logger.info("Starting browser...")
         self.playwright = await async_playwright().start()
         self.browser = await self.playwright.chromium.launch(
             headless=True,
             args=['--no-sandbox', '--disable-setuid-sandbox']
         )
+        self._context = await self.browser.new_context()
+        
+        # Pre-warm pages so fetches don't pay page bootstrap cost
+        self._pages = asyncio.Queue(maxsize=PAGE_POOL_SIZE)
+        for _ in range(PAGE_POOL_SIZE):
+            self._pages.put_nowait(await self._create_page())
         logger.info("Browser started successfully")
     
-    async def new_page(self) -> Page:
-        """Create a new page"""
-        if not self.browser:
-            await self.start()
-        
-        page = await self.browser.new_page()
+    async def _create_page(self) -> Page:
+        """Create a new page in the shared context"""
+        page = await self._context.new_page()
         # Set a reasonable timeout
         page.set_default_timeout(config.BROWSER_TIMEOUT)
         return page
     
-    async def fetch_page_content(self, url: str) -> str:
+    @asynccontextmanager
+    async def acquire_page(self):
         """
-        Visit a URL and return the rendered HTML content
+        Borrow a page from the pool and return it once done
         """
-        logger.info(f"Fetching page: {url}")
-        page = await self.new_page()
+        if not self.browser:
+            await self.start()
         
+        page = await asyncio.wait_for(
+            self._pages.get(), timeout=config.BROWSER_TIMEOUT / 1000
+        )
+        if page is None:
+            # Empty slot left by a page that could not be recreated
+            try:
+                page = await self._create_page()
+            except BaseException:
+                self._pages.put_nowait(None)
+                raise
+        try:
+            yield page
+        finally:
+            await self.release_page(page)
+    
+    async def release_page(self, page: Page):
+        """
+        Reset a page and put it back in the pool
+        The slot is always returned; None marks a page to recreate on next use
+        """
+        released = None
         try:
-            # Navigate to the page
-            await page.goto(url, wait_until="networkidle")
-            
-            # Wait a bit for any dynamic content to load
-            await page.wait_for_timeout(2000)
-            
-            # Get the full HTML content
-            content = await page.content()
-            
-            # Also get the text content from the body
-            body_text = await page.evaluate("() => document.body.innerText")
-            
-            logger.info(f"Successfully fetched page content ({len(content)} chars)")
-            
-            return body_text
-            
+            # Reset DOM state between uses
+            await page.goto("about:blank")
+            released = page
         except Exception as e:
-            logger.error(f"Error fetching page {url}: {e}")
-            raise
+            logger.warning(f"Could not reset page, replacing it: {e}")
+            try:
+                await page.close()
+            except Exception:
+                pass
+            try:
+                released = await self._create_page()
+            except Exception as e2:
+                logger.error(f"Could not create replacement page: {e2}")
         finally:
-            await page.close()
+            self._pages.put_nowait(released)
+    
+    async def fetch_page_content(self, url: str) -> str:
+        """
+        Visit a URL and return the rendered body text
+        Returns an empty string if the page times out
+        """
+        logger.info(f"Fetching page: {url}")
+        
+        async with self.acquire_page() as page:
+            try:
+                # Navigate and wait for rendered text instead of a fixed sleep
+                await page.goto(url, wait_until="domcontentloaded")
+                await page.wait_for_selector(
+                    "body", state="attached", timeout=config.BROWSER_TIMEOUT
+                )
+                try:
+                    await page.wait_for_function(
+                        "() => document.body && document.body.innerText.trim().length > 50",
+                        timeout=PAGE_RENDER_TIMEOUT
+                    )
+                except PlaywrightTimeoutError:
+                    # Fall back to waiting for the network to settle, then
+                    # read whatever text the page has either way
+                    logger.warning(f"Content not ready on {url}, waiting for networkidle")
+                    try:
+                        await page.wait_for_load_state(
+                            "networkidle", timeout=NETWORK_IDLE_TIMEOUT
+                        )
+                    except PlaywrightTimeoutError:
+                        logger.warning(f"Network never went idle on {url}, using current content")
+                
+                # Get the text content from the body
+                body_text = await page.evaluate("() => document.body.innerText")
+                
+                logger.info("Successfully fetched page content (%d chars)", len(body_text))
+                
+                return body_text
+                
+            except PlaywrightTimeoutError as e:
+                # Don't abort the whole chain over one hanging page
+                logger.error(f"Timed out fetching page {url}: {e}")
+                return ""
+            except Exception as e:
+                logger.error(f"Error fetching page {url}: {e}")
+                raise
     
     async def close(self):
         """Close browser and cleanup"""
+        if self._context:
+            await self._context.close()
         if self.browser:
             await self.browser.close()
         if self.playwright:
@@ -74,12 +153,24 @@ class BrowserManager:
 
 # Singleton instance
 _browser_manager = None
+_browser_lock = asyncio.Lock()
 
 
 async def get_browser_manager() -> BrowserManager:
     """Get or create browser manager singleton"""
     global _browser_manager
-    if _browser_manager is None:
-        _browser_manager = BrowserManager()
-        await _browser_manager.start()
-    return _browser_manager
\ No newline at end of file
+    # Lock so concurrent callers don't launch two browsers
+    async with _browser_lock:
+        if _browser_manager is None:
+            manager = BrowserManager()
+            await manager.start()
+            _browser_manager = manager
+    return _browser_manager
+
+
+async def close_browser_manager():
+    """Close the browser manager singleton if it was started"""
+    global _browser_manager
+    if _browser_manager is not None:
+        await _browser_manager.close()
+        _browser_manager = None
\ No newline at end of file
@@ -1,8 +1,16 @@
 import os
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+__all__ = [
+    "EMAIL", "SECRET", "ANTHROPIC_API_KEY", "HOST", "PORT",
+    "TIMEOUT_SECONDS", "BROWSER_TIMEOUT",
+    "LLM_MAX_CONCURRENT", "LLM_REQUESTS_PER_MINUTE", "BATCH_TIMEOUT_SECONDS",
+]
+
+# Load environment variables from .env file, but only when they are not
+# already set (e.g. on Railway) so production skips the file parse
+if not all(os.getenv(name) for name in ("EMAIL", "SECRET", "ANTHROPIC_API_KEY")):
+    from dotenv import load_dotenv
+    load_dotenv()
 
 # Your credentials (from .env file)
 EMAIL = os.getenv("EMAIL", "your-email@example.com")
@@ -16,4 +24,9 @@ PORT = int(os.getenv("PORT", 8000))  # Railway provides PORT env variable
 
 # Quiz solver configuration
 TIMEOUT_SECONDS = 180      # 3 minutes total timeout
-BROWSER_TIMEOUT = 30000 
\ No newline at end of file
+BROWSER_TIMEOUT = 30000 
+
+# Anthropic API limits
+LLM_MAX_CONCURRENT = 5       # Max in-flight requests
+LLM_REQUESTS_PER_MINUTE = 50
+BATCH_TIMEOUT_SECONDS = 60   # Max wait for a Message Batches result
\ No newline at end of file
@@ -1,17 +1,239 @@
-from anthropic import AsyncAnthropic
+from anthropic import AsyncAnthropic, DefaultAioHttpClient, RateLimitError
+from collections import OrderedDict, deque
+import asyncio
+import hashlib
 import logging
+import re
+import time
 import json
+from typing import List, Optional
 import config
 
+try:
+    # orjson parses and serializes noticeably faster than the stdlib
+    import orjson
+    
+    def _loads(text: str):
+        return orjson.loads(text)
+    
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+except ImportError:
+    _loads = json.loads
+    
+    def _dumps(obj) -> str:
+        return json.dumps(obj, indent=2)
+
 logger = logging.getLogger(__name__)
 
+# Maximum number of responses kept per cache
+CACHE_MAX_SIZE = 256
+
+# Seconds between Message Batches status checks
+BATCH_POLL_INTERVAL = 2.0
+
+# First "{" to last "}" of an LLM response
+_JSON_OBJ = re.compile(r'\{.*\}', re.DOTALL)
+
+# Static prompt prefixes, sent as cacheable blocks ahead of the question
+ANALYZE_INSTRUCTIONS = """You are analyzing a data quiz question. Extract the following information.
+
+Provide your analysis in JSON format with these fields:
+{
+    "task_type": "pdf_analysis|web_scraping|api_call|data_analysis|visualization|other",
+    "data_source": "URL or description of where to get data",
+    "operations": ["list of operations to perform"],
+    "answer_format": "number|string|boolean|json|base64_image",
+    "submit_url": "URL where answer should be submitted"
+}
+
+Respond ONLY with valid JSON, no other text."""
+
+CODEGEN_INSTRUCTIONS = """You are a data analysis expert. Generate Python code to solve the quiz question below.
+
+Generate a complete Python script that:
+1. Fetches/downloads the required data
+2. Processes and analyzes it
+3. Returns the final answer
+
+The code should:
+- Use common libraries (requests, pandas, PyPDF2, etc.)
+- Handle errors gracefully
+- Return the answer in a variable called 'answer'
+- Be ready to execute as-is
+
+Respond with ONLY the Python code, no explanation or markdown formatting."""
+
+
+class AdaptiveRateLimiter:
+    """
+    Sliding-window requests-per-minute limiter with AIMD adjustment:
+    the allowed rate is halved on rate-limit errors (at most once per
+    period, so one burst of 429s counts once) and recovers by one request
+    per minute afterwards
+    """
+    
+    def __init__(self, max_rate: int, period: float = 60.0):
+        self.max_rate = max_rate
+        self.rate = float(max_rate)
+        self.period = period
+        self._sent = deque()
+        self._last_adjust = time.monotonic()
+        self._last_decrease = None
+        self._lock = asyncio.Lock()
+    
+    def _recover(self, now: float):
+        """Additively increase the rate for every full period without errors"""
+        if self.rate >= self.max_rate:
+            return
+        periods = int((now - self._last_adjust) // self.period)
+        if periods > 0:
+            self.rate = min(self.max_rate, self.rate + periods)
+            self._last_adjust += periods * self.period
+    
+    async def acquire(self):
+        """Wait until a request may be sent under the current rate"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._recover(now)
+                while self._sent and now - self._sent[0] >= self.period:
+                    self._sent.popleft()
+                if len(self._sent) < int(self.rate):
+                    self._sent.append(now)
+                    return
+                await asyncio.sleep(self.period - (now - self._sent[0]))
+    
+    def decrease(self):
+        """Multiplicatively back off after a rate-limit error"""
+        now = time.monotonic()
+        if self._last_decrease is not None and now - self._last_decrease < self.period:
+            # Already backed off for this burst
+            return
+        self.rate = max(1.0, self.rate * 0.5)
+        self._last_adjust = now
+        self._last_decrease = now
+        logger.warning(f"Rate limited, lowering LLM request rate to {int(self.rate)}/min")
+
+
+def _direct_answer_done(text: str) -> bool:
+    """Whether a streamed direct answer is complete enough to stop reading"""
+    text = text.lstrip()
+    if not text:
+        return False
+    if text[0] in '{[':
+        # JSON answer: stop once its brackets balance
+        close = '}' if text[0] == '{' else ']'
+        return text.count(text[0]) == text.count(close)
+    # Single value: stop at the first line break
+    return '\n' in text
+
+
+def _cache_key(question_text: str) -> str:
+    """Hash the question text into a compact cache key"""
+    return hashlib.blake2b(question_text.encode(), digest_size=16).hexdigest()
+
 
 class LLMClient:
     """Client for interacting with Claude API"""
     
     def __init__(self):
-        self.client = AsyncAnthropic(api_key=config.ANTHROPIC_API_KEY)
+        try:
+            # aiohttp transport has better concurrency than the default httpx one
+            http_client = DefaultAioHttpClient()
+        except RuntimeError as e:
+            # Raised when the anthropic[aiohttp] extra is not installed
+            logger.warning(f"aiohttp transport unavailable, using httpx: {e}")
+            http_client = None
+        if http_client is not None:
+            self.client = AsyncAnthropic(
+                api_key=config.ANTHROPIC_API_KEY,
+                http_client=http_client
+            )
+        else:
+            self.client = AsyncAnthropic(api_key=config.ANTHROPIC_API_KEY)
         self.model = "claude-3-haiku-20240307"  # Most basic, widely available model
+        # Stay within the provider's concurrency and requests-per-minute limits
+        self._semaphore = asyncio.Semaphore(config.LLM_MAX_CONCURRENT)
+        self._limiter = AdaptiveRateLimiter(config.LLM_REQUESTS_PER_MINUTE)
+        # Responses for questions already seen, oldest first
+        self._analyze_cache: OrderedDict = OrderedDict()
+        self._direct_cache: OrderedDict = OrderedDict()
+    
+    async def close(self):
+        """Close the underlying HTTP transport"""
+        await self.client.close()
+    
+    async def _create_message(self, **kwargs):
+        """Send a messages request through the concurrency and rate limits"""
+        async with self._semaphore:
+            await self._limiter.acquire()
+            try:
+                return await self.client.messages.create(**kwargs)
+            except RateLimitError:
+                self._limiter.decrease()
+                raise
+    
+    async def _stream_text(self, done=None, **kwargs) -> str:
+        """
+        Stream a messages request through the concurrency and rate limits
+        and return the generated text. If done(text) returns True the
+        stream is closed early so the rest of the generation is dropped
+        """
+        chunks = []
+        async with self._semaphore:
+            await self._limiter.acquire()
+            try:
+                async with self.client.messages.stream(**kwargs) as stream:
+                    async for text in stream.text_stream:
+                        chunks.append(text)
+                        if done and done("".join(chunks)):
+                            break
+            except RateLimitError:
+                self._limiter.decrease()
+                raise
+        return "".join(chunks)
+    
+    def forget_direct_answer(self, question_text: str):
+        """Drop the cached direct answer for a question (e.g. after it was wrong)"""
+        self._direct_cache.pop(_cache_key(question_text), None)
+    
+    @staticmethod
+    def _cache_get(cache: OrderedDict, key: str):
+        """Return a cached value (or None) and mark it as recently used"""
+        if key not in cache:
+            return None
+        cache.move_to_end(key)
+        return cache[key]
+    
+    @staticmethod
+    def _cache_put(cache: OrderedDict, key: str, value):
+        """Store a value, evicting the least recently used entry if full"""
+        cache[key] = value
+        cache.move_to_end(key)
+        if len(cache) > CACHE_MAX_SIZE:
+            cache.popitem(last=False)
+    
+    def _analyze_params(self, question_text: str) -> dict:
+        """Build the messages request parameters for analyzing a question"""
+        content = [
+            {"type": "text", "text": ANALYZE_INSTRUCTIONS, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": f"Question:\n{question_text}"},
+        ]
+        return {
+            "model": self.model,
+            "max_tokens": 512,
+            "stop_sequences": ["\n\n\n"],
+            "messages": [{"role": "user", "content": content}],
+        }
+    
+    @staticmethod
+    def _parse_analysis(response_text: str) -> dict:
+        """Parse the JSON analysis out of an LLM response"""
+        # Extract just the JSON object (also drops any markdown fences)
+        match = _JSON_OBJ.search(response_text)
+        response_text = match.group(0) if match else response_text.strip()
+        return _loads(response_text)
     
     async def analyze_question(self, question_text: str) -> dict:
         """
@@ -20,55 +242,26 @@ class LLMClient:
         - What analysis needs to be performed
         - What format the answer should be in
         """
-        
-        prompt = f"""You are analyzing a data quiz question. Extract the following information:
-
-Question:
-{question_text}
-
-Provide your analysis in JSON format with these fields:
-{{
-    "task_type": "pdf_analysis|web_scraping|api_call|data_analysis|visualization|other",
-    "data_source": "URL or description of where to get data",
-    "operations": ["list of operations to perform"],
-    "answer_format": "number|string|boolean|json|base64_image",
-    "submit_url": "URL where answer should be submitted"
-}}
-
-Respond ONLY with valid JSON, no other text."""
+        key = _cache_key(question_text)
+        cached = self._cache_get(self._analyze_cache, key)
+        if cached is not None:
+            logger.info("Using cached question analysis")
+            return cached
         
         logger.info("Analyzing question with LLM...")
         
         try:
-            message = await self.client.messages.create(
-                model=self.model,
-                max_tokens=2000,
-                messages=[{"role": "user", "content": prompt}]
+            # Stop as soon as the JSON object is complete
+            response_text = await self._stream_text(
+                done=lambda text: '{' in text and text.count('{') == text.count('}'),
+                **self._analyze_params(question_text)
             )
             
-            response_text = message.content[0].text
-            logger.info(f"LLM response: {response_text[:200]}...")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("LLM response: %s...", response_text[:200])
             
-            # Strip markdown code blocks if present
-            response_text = response_text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text.replace('```json', '', 1)
-            if response_text.startswith('```'):
-                response_text = response_text.replace('```', '', 1)
-            if response_text.endswith('```'):
-                response_text = response_text.rsplit('```', 1)[0]
-            
-            # Try to extract just the JSON object
-            # Find first { and last }
-            start = response_text.find('{')
-            end = response_text.rfind('}')
-            if start != -1 and end != -1:
-                response_text = response_text[start:end+1]
-            
-            response_text = response_text.strip()
-            
-            # Parse JSON response
-            analysis = json.loads(response_text)
+            analysis = self._parse_analysis(response_text)
+            self._cache_put(self._analyze_cache, key, analysis)
             return analysis
             
         except json.JSONDecodeError as e:
@@ -79,43 +272,83 @@ Respond ONLY with valid JSON, no other text."""
             logger.error(f"Error calling LLM: {e}")
             raise
     
+    async def analyze_questions_batch(self, questions: List[str]) -> List[Optional[dict]]:
+        """
+        Analyze several questions with one Message Batches request
+        Results are stored in the analysis cache; questions whose analysis
+        failed or did not finish in time come back as None
+        """
+        keys = [_cache_key(q) for q in questions]
+        results = [self._cache_get(self._analyze_cache, key) for key in keys]
+        pending = {f"q-{i}": i for i, result in enumerate(results) if result is None}
+        if not pending:
+            return results
+        
+        logger.info(f"Submitting batch analysis for {len(pending)} questions...")
+        
+        try:
+            batch = await self.client.messages.batches.create(requests=[
+                {"custom_id": custom_id, "params": self._analyze_params(questions[i])}
+                for custom_id, i in pending.items()
+            ])
+            
+            deadline = time.monotonic() + config.BATCH_TIMEOUT_SECONDS
+            try:
+                while batch.processing_status != "ended":
+                    if time.monotonic() > deadline:
+                        logger.warning(f"Batch {batch.id} did not finish in time, cancelling")
+                        await self.client.messages.batches.cancel(batch.id)
+                        return results
+                    await asyncio.sleep(BATCH_POLL_INTERVAL)
+                    batch = await self.client.messages.batches.retrieve(batch.id)
+            except asyncio.CancelledError:
+                # Nobody is waiting for the results any more
+                await self.client.messages.batches.cancel(batch.id)
+                raise
+            
+            async for entry in await self.client.messages.batches.results(batch.id):
+                i = pending.get(entry.custom_id)
+                if i is None:
+                    continue
+                if entry.result.type != "succeeded":
+                    logger.warning(f"Batch analysis {entry.custom_id} {entry.result.type}")
+                    continue
+                try:
+                    analysis = self._parse_analysis(entry.result.message.content[0].text)
+                except json.JSONDecodeError as e:
+                    logger.warning(f"Failed to parse batch analysis {entry.custom_id}: {e}")
+                    continue
+                self._cache_put(self._analyze_cache, keys[i], analysis)
+                results[i] = analysis
+            
+            logger.info(f"Batch analysis finished ({sum(r is not None for r in results)}/{len(results)})")
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error running batch analysis: {e}")
+            raise
+    
     async def generate_solution_code(self, question_text: str, analysis: dict) -> str:
         """
         Generate Python code to solve the quiz question
         """
         
-        prompt = f"""You are a data analysis expert. Generate Python code to solve this quiz question.
-
-Question:
-{question_text}
-
-Analysis:
-{json.dumps(analysis, indent=2)}
-
-Generate a complete Python script that:
-1. Fetches/downloads the required data
-2. Processes and analyzes it
-3. Returns the final answer
-
-The code should:
-- Use common libraries (requests, pandas, PyPDF2, etc.)
-- Handle errors gracefully
-- Return the answer in a variable called 'answer'
-- Be ready to execute as-is
-
-Respond with ONLY the Python code, no explanation or markdown formatting."""
+        content = [
+            {"type": "text", "text": CODEGEN_INSTRUCTIONS, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": f"Question:\n{question_text}\n\nAnalysis:\n{_dumps(analysis)}"},
+        ]
         
         logger.info("Generating solution code with LLM...")
         
         try:
-            message = await self.client.messages.create(
+            message = await self._create_message(
                 model=self.model,
-                max_tokens=4000,
-                messages=[{"role": "user", "content": prompt}]
+                max_tokens=2048,
+                messages=[{"role": "user", "content": content}]
             )
             
             code = message.content[0].text
-            logger.info(f"Generated code ({len(code)} chars)")
+            logger.info("Generated code (%d chars)", len(code))
             
             return code
             
@@ -127,6 +360,11 @@ Respond with ONLY the Python code, no explanation or markdown formatting."""
         """
         Ask LLM to directly solve the question if it's simple enough
         """
+        key = _cache_key(question_text)
+        cached = self._cache_get(self._direct_cache, key)
+        if cached is not None:
+            logger.info(f"Using cached direct answer: {cached}")
+            return cached
         
         prompt = f"""Solve this data quiz question directly. Provide ONLY the final answer, nothing else.
 
@@ -138,23 +376,41 @@ Answer (just the value, no explanation):"""
         logger.info("Asking LLM to solve directly...")
         
         try:
-            message = await self.client.messages.create(
+            response_text = await self._stream_text(
+                done=_direct_answer_done,
                 model=self.model,
-                max_tokens=1000,
+                max_tokens=128,
+                stop_sequences=["\n\n"],
                 messages=[{"role": "user", "content": prompt}]
             )
             
-            answer = message.content[0].text.strip()
-            logger.info(f"Direct answer: {answer}")
+            answer = response_text.strip()
+            if answer.startswith(('{', '[')):
+                # JSON answer: only complete if it parses
+                try:
+                    _loads(answer)
+                    complete = True
+                except ValueError:
+                    complete = False
+            else:
+                # Single value: anything after the first line is dropped
+                answer = answer.split('\n', 1)[0].strip()
+                complete = bool(answer)
+            logger.info("Direct answer: %s", answer)
             
             # Try to parse as number if possible
             try:
-                return int(answer)
+                answer = int(answer)
             except ValueError:
                 try:
-                    return float(answer)
+                    answer = float(answer)
                 except ValueError:
-                    return answer
+                    pass
+            
+            # Don't cache truncated or empty answers
+            if complete:
+                self._cache_put(self._direct_cache, key, answer)
+            return answer
             
         except Exception as e:
             logger.error(f"Error getting direct answer: {e}")
@@ -170,4 +426,12 @@ def get_llm_client() -> LLMClient:
     global _llm_client
     if _llm_client is None:
         _llm_client = LLMClient()
-    return _llm_client
\ No newline at end of file
+    return _llm_client
+
+
+async def close_llm_client():
+    """Close the LLM client singleton if it was created"""
+    global _llm_client
+    if _llm_client is not None:
+        await _llm_client.close()
+        _llm_client = None
\ No newline at end of file
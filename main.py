@@ -1,7 +1,13 @@
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from pydantic import BaseModel, EmailStr
+from contextlib import asynccontextmanager
+from typing import List, Optional
+import asyncio
 import logging
+import time
 from datetime import datetime
+from browser import get_browser_manager, close_browser_manager
+from llm_client import get_llm_client, close_llm_client
 import config
 
 # Setup logging
@@ -11,7 +17,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Quiz Solver API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warm up the LLM client and browser before serving requests
+    so the first quiz doesn't pay the startup cost
+    """
+    logger.info("Warming up LLM client and browser...")
+    get_llm_client()
+    await get_browser_manager()
+    yield
+    logger.info("Shutting down...")
+    await close_browser_manager()
+    await close_llm_client()
+
+
+app = FastAPI(title="Quiz Solver API", lifespan=lifespan)
 
 
 class QuizRequest(BaseModel):
@@ -20,6 +42,12 @@ class QuizRequest(BaseModel):
     url: str
 
 
+class QuizBatchRequest(BaseModel):
+    email: EmailStr
+    secret: str
+    urls: List[str]
+
+
 class QuizResponse(BaseModel):
     status: str
     message: str
@@ -36,29 +64,36 @@ async def root():
     }
 
 
-@app.post("/solve", response_model=QuizResponse)
-async def solve_quiz(request: QuizRequest, background_tasks: BackgroundTasks):
-    """
-    Main endpoint to receive quiz URLs and start solving
-    """
-    logger.info(f"Received request for quiz: {request.url}")
-    
+def verify_credentials(email: str, secret: str):
+    """Reject requests whose secret or email don't match the config"""
     # Verify secret
-    if request.secret != config.SECRET:
-        logger.warning(f"Invalid secret provided for email: {request.email}")
+    if secret != config.SECRET:
+        logger.warning(f"Invalid secret provided for email: {email}")
         raise HTTPException(status_code=403, detail="Invalid secret")
     
     # Verify email
-    if request.email != config.EMAIL:
-        logger.warning(f"Email mismatch: {request.email} != {config.EMAIL}")
+    if email != config.EMAIL:
+        logger.warning(f"Email mismatch: {email} != {config.EMAIL}")
         raise HTTPException(status_code=403, detail="Email does not match")
     
-    logger.info(f"Authentication successful for {request.email}")
+    logger.info(f"Authentication successful for {email}")
+
+
+@app.post("/solve", response_model=QuizResponse)
+async def solve_quiz(request: QuizRequest, background_tasks: BackgroundTasks):
+    """
+    Main endpoint to receive quiz URLs and start solving
+    """
+    start_time = time.monotonic()
+    logger.info(f"Received request for quiz: {request.url}")
+    verify_credentials(request.email, request.secret)
     
     # Start solving the quiz in the background
     # This allows us to respond with 200 immediately
     # while processing takes place
-    background_tasks.add_task(solve_quiz_chain, request.url, request.email, request.secret)
+    background_tasks.add_task(
+        solve_quiz_chain, request.url, request.email, request.secret, start_time
+    )
     
     return QuizResponse(
         status="accepted",
@@ -67,7 +102,41 @@ async def solve_quiz(request: QuizRequest, background_tasks: BackgroundTasks):
     )
 
 
-async def solve_quiz_chain(start_url: str, email: str, secret: str):
+@app.post("/solve_many", response_model=QuizResponse)
+async def solve_quiz_many(request: QuizBatchRequest, background_tasks: BackgroundTasks):
+    """
+    Start solving several quiz chains at once
+    """
+    start_time = time.monotonic()
+    logger.info(f"Received request for {len(request.urls)} quizzes")
+    verify_credentials(request.email, request.secret)
+    
+    background_tasks.add_task(
+        solve_quiz_chains, request.urls, request.email, request.secret, start_time
+    )
+    
+    return QuizResponse(
+        status="accepted",
+        message=f"Quiz solving started for {len(request.urls)} quizzes",
+        timestamp=datetime.now().isoformat()
+    )
+
+
+async def solve_quiz_chains(start_urls: List[str], email: str, secret: str, start_time: float):
+    """
+    Fetch the start pages together, then run the chains concurrently
+    """
+    from solver import fetch_questions
+    
+    questions = await fetch_questions(start_urls)
+    await asyncio.gather(*(
+        solve_quiz_chain(url, email, secret, start_time, question)
+        for url, question in zip(start_urls, questions)
+    ))
+
+
+async def solve_quiz_chain(start_url: str, email: str, secret: str,
+                           start_time: Optional[float] = None, first_question: Optional[str] = None):
     """
     Main quiz solving logic - chains through multiple quizzes
     """
@@ -77,8 +146,10 @@ async def solve_quiz_chain(start_url: str, email: str, secret: str):
     
     try:
         solver = QuizSolver(email, secret)
-        await solver.solve_chain(start_url)
-        logger.info("Quiz chain completed successfully")
+        if await solver.solve_chain(start_url, start_time, first_question):
+            logger.info("Quiz chain completed successfully")
+        else:
+            logger.warning("Quiz chain stopped before completion")
     except Exception as e:
         logger.error(f"Error solving quiz chain: {e}", exc_info=True)
 
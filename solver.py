@@ -2,8 +2,8 @@ import logging
 import httpx
 import asyncio
 import re
-from datetime import datetime, timedelta
-from typing import Optional
+import time
+from typing import List, Optional
 from urllib.parse import urljoin
 from browser import get_browser_manager
 from llm_client import get_llm_client
@@ -11,6 +11,37 @@ import config
 
 logger = logging.getLogger(__name__)
 
+# Patterns for finding the submit URL in question text
+# Look for "Post your answer to https://..."
+_SUBMIT_PATTERNS = [
+    re.compile(p, re.IGNORECASE) for p in (
+        r'POST.*?to\s+(https?://[^\s]+)',
+        r'submit.*?(https?://[^\s]+submit[^\s]*)',
+        r'POST.*?(https?://[^\s]+)',
+    )
+]
+_SUBMIT_URL_RE = re.compile(r'https?://[^\s<>"]*submit[^\s<>"]*', re.IGNORECASE)
+_REL_RE = re.compile(r'(?:POST|submit).*?to\s+(/[^\s]+)', re.IGNORECASE)
+
+# How many times a page that loads without question text is retried
+MAX_PAGE_RETRIES = 2
+
+
+class EmptyPageError(Exception):
+    """Raised when a quiz page loads without any question text"""
+
+
+async def fetch_questions(urls: List[str]) -> List[str]:
+    """
+    Fetch several quiz pages concurrently
+    Pages that fail to load come back as empty strings
+    """
+    browser = await get_browser_manager()
+    pages = await asyncio.gather(
+        *(browser.fetch_page_content(url) for url in urls), return_exceptions=True
+    )
+    return [text if isinstance(text, str) else "" for text in pages]
+
 
 class QuizSolver:
     """Main quiz solver that chains through multiple quizzes"""
@@ -18,67 +49,111 @@ class QuizSolver:
     def __init__(self, email: str, secret: str):
         self.email = email
         self.secret = secret
-        self.start_time = None
+        self._t0 = None
         self.llm_client = get_llm_client()
+        # Reused for every submission so connections are kept alive
+        self._http = httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=10)
+        )
+    
+    async def aclose(self):
+        """Close the HTTP client"""
+        await self._http.aclose()
     
     def time_remaining(self) -> float:
         """Get remaining time in seconds"""
-        if not self.start_time:
+        if self._t0 is None:
             return config.TIMEOUT_SECONDS
-        elapsed = (datetime.now() - self.start_time).total_seconds()
-        return config.TIMEOUT_SECONDS - elapsed
+        return config.TIMEOUT_SECONDS - (time.monotonic() - self._t0)
     
-    async def solve_chain(self, start_url: str):
+    async def solve_chain(self, start_url: str, start_time: Optional[float] = None,
+                          first_question: Optional[str] = None) -> bool:
         """
         Main method to solve the quiz chain
+        start_time is the time.monotonic() value the time budget counts from
+        (defaults to now); first_question is already fetched start page text
+        Returns True if the chain ran to its end
         """
-        self.start_time = datetime.now()
-        logger.info(f"Starting quiz chain at {self.start_time}")
+        self._t0 = start_time if start_time is not None else time.monotonic()
+        logger.info("Starting quiz chain")
         
         current_url = start_url
         question_count = 0
+        page_retries = 0
+        completed = False
         
-        while current_url and self.time_remaining() > 10:  # Keep 10s buffer
-            question_count += 1
-            logger.info(f"\n{'='*60}")
-            logger.info(f"Question {question_count}: {current_url}")
-            logger.info(f"Time remaining: {self.time_remaining():.1f}s")
-            logger.info(f"{'='*60}\n")
-            
-            try:
-                # Solve the current quiz
-                next_url = await self.solve_single_quiz(current_url)
+        try:
+            while current_url and self.time_remaining() > 10:  # Keep 10s buffer
+                question_count += 1
+                logger.info(f"\n{'='*60}")
+                logger.info(f"Question {question_count}: {current_url}")
+                logger.info(f"Time remaining: {self.time_remaining():.1f}s")
+                logger.info(f"{'='*60}\n")
                 
-                if next_url:
-                    logger.info(f"Moving to next quiz: {next_url}")
-                    current_url = next_url
-                else:
-                    logger.info("Quiz chain completed!")
-                    break
+                try:
+                    # Solve the current quiz
+                    next_url = await self.solve_single_quiz(current_url, first_question)
+                    first_question = None
+                    page_retries = 0
                     
-            except Exception as e:
-                logger.error(f"Error solving quiz {current_url}: {e}", exc_info=True)
-                break
-        
-        if self.time_remaining() <= 10:
-            logger.warning("Timeout approaching, stopping quiz chain")
-        
-        logger.info(f"Solved {question_count} questions in total")
+                    if next_url:
+                        logger.info(f"Moving to next quiz: {next_url}")
+                        current_url = next_url
+                    else:
+                        logger.info("Quiz chain completed!")
+                        completed = True
+                        break
+                        
+                except EmptyPageError as e:
+                    # Retry the same question while there is time left
+                    first_question = None
+                    question_count -= 1
+                    page_retries += 1
+                    if page_retries > MAX_PAGE_RETRIES:
+                        logger.error(f"Giving up on {current_url}: {e}")
+                        break
+                    logger.warning(f"{e}, retrying ({page_retries}/{MAX_PAGE_RETRIES})")
+                    
+                except Exception as e:
+                    logger.error(f"Error solving quiz {current_url}: {e}", exc_info=True)
+                    break
+            
+            if self.time_remaining() <= 10:
+                logger.warning("Timeout approaching, stopping quiz chain")
+            
+            logger.info(f"Solved {question_count} questions in total")
+            return completed
+        finally:
+            await self.aclose()
     
-    async def solve_single_quiz(self, quiz_url: str) -> Optional[str]:
+    async def solve_single_quiz(self, quiz_url: str, question_text: Optional[str] = None) -> Optional[str]:
         """
         Solve a single quiz question
+        question_text can be passed in if the page was already fetched
         Returns the next quiz URL if any
         """
         # Step 1: Fetch the quiz page content
-        browser = await get_browser_manager()
-        question_text = await browser.fetch_page_content(quiz_url)
+        if not question_text:
+            browser = await get_browser_manager()
+            question_text = await browser.fetch_page_content(quiz_url)
+        
+        if not question_text.strip():
+            raise EmptyPageError(f"No question text found on {quiz_url}")
         
-        logger.info(f"Question text:\n{question_text[:500]}...")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Question text:\n%s...", question_text[:500])
         
-        # Step 2: Analyze the question
-        analysis = await self.llm_client.analyze_question(question_text)
-        logger.info(f"Analysis: {analysis}")
+        # Step 2: Analyze the question and try a direct answer concurrently
+        # (the two LLM calls are independent of each other)
+        analyze_task = asyncio.create_task(self.llm_client.analyze_question(question_text))
+        direct_task = asyncio.create_task(self.llm_client.solve_question_direct(question_text))
+        analysis, direct_answer = await asyncio.gather(
+            analyze_task, direct_task, return_exceptions=True
+        )
+        if isinstance(analysis, BaseException):
+            raise analysis
+        logger.info("Analysis: %s", analysis)
         
         # Step 3: Extract submit URL from question or analysis
         submit_url = self.extract_submit_url(question_text, analysis, quiz_url)
@@ -90,11 +165,11 @@ class QuizSolver:
         logger.info(f"Submit URL: {submit_url}")
         
         # Step 4: Solve the question
-        answer = await self.solve_question(question_text, analysis)
-        logger.info(f"Answer: {answer}")
+        answer = await self.solve_question(question_text, analysis, direct_answer)
+        logger.info("Answer: %s", answer)
         
         # Step 5: Submit the answer
-        next_url = await self.submit_answer(submit_url, quiz_url, answer)
+        next_url = await self.submit_answer(submit_url, quiz_url, answer, question_text)
         
         return next_url
     
@@ -110,36 +185,30 @@ class QuizSolver:
             return submit_url
         
         # Try to find URL pattern in question text
-        # Look for "Post your answer to https://..."
-        patterns = [
-            r'POST.*?to\s+(https?://[^\s]+)',
-            r'submit.*?(https?://[^\s]+submit[^\s]*)',
-            r'POST.*?(https?://[^\s]+)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, question_text, re.IGNORECASE)
+        for pattern in _SUBMIT_PATTERNS:
+            match = pattern.search(question_text)
             if match:
                 url = match.group(1).rstrip('.,;:')
                 return url
         
         # Look for any URL that contains "submit"
-        urls = re.findall(r'https?://[^\s<>"]+', question_text)
-        for url in urls:
-            if 'submit' in url.lower():
-                return url.rstrip('.,;:')
+        match = _SUBMIT_URL_RE.search(question_text)
+        if match:
+            return match.group(0).rstrip('.,;:')
         
         # Look for relative URLs like "/submit"
-        relative_match = re.search(r'(?:POST|submit).*?to\s+(/[^\s]+)', question_text, re.IGNORECASE)
+        relative_match = _REL_RE.search(question_text)
         if relative_match:
             relative_url = relative_match.group(1).rstrip('.,;:')
             return urljoin(current_url, relative_url)
         
         return None
     
-    async def solve_question(self, question_text: str, analysis: dict) -> any:
+    async def solve_question(self, question_text: str, analysis: dict, direct_answer: any = None) -> any:
         """
         Solve the question based on its type
+        direct_answer may hold an already computed direct result (or the
+        exception it raised); otherwise the LLM is asked here
         """
         task_type = analysis.get("task_type", "unknown")
         
@@ -149,8 +218,11 @@ class QuizSolver:
         
         try:
             # Try direct solving first (works for simple questions)
-            answer = await self.llm_client.solve_question_direct(question_text)
-            return answer
+            if direct_answer is None:
+                direct_answer = await self.llm_client.solve_question_direct(question_text)
+            if isinstance(direct_answer, BaseException):
+                raise direct_answer
+            return direct_answer
         except Exception as e:
             logger.error(f"Direct solving failed: {e}")
             
@@ -170,9 +242,11 @@ class QuizSolver:
                 logger.error(f"Code generation failed: {e2}")
                 raise
     
-    async def submit_answer(self, submit_url: str, quiz_url: str, answer: any) -> Optional[str]:
+    async def submit_answer(self, submit_url: str, quiz_url: str, answer: any,
+                            question_text: Optional[str] = None) -> Optional[str]:
         """
         Submit the answer to the quiz endpoint
+        If it is wrong, the cached direct answer for question_text is dropped
         Returns next quiz URL if any
         """
         payload = {
@@ -183,31 +257,33 @@ class QuizSolver:
         }
         
         logger.info(f"Submitting answer to {submit_url}")
-        logger.info(f"Payload: {payload}")
+        logger.info("Payload: %s", payload)
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                response = await client.post(submit_url, json=payload)
-                response.raise_for_status()
-                
-                result = response.json()
-                logger.info(f"Submission result: {result}")
-                
-                is_correct = result.get("correct", False)
-                reason = result.get("reason", "")
-                next_url = result.get("url", None)
-                
-                if is_correct:
-                    logger.info("✓ Answer is CORRECT!")
-                else:
-                    logger.warning(f"✗ Answer is INCORRECT: {reason}")
-                
-                return next_url
-                
-            except httpx.HTTPStatusError as e:
-                logger.error(f"HTTP error submitting answer: {e}")
-                logger.error(f"Response: {e.response.text}")
-                return None
-            except Exception as e:
-                logger.error(f"Error submitting answer: {e}")
-                return None
\ No newline at end of file
+        try:
+            response = await self._http.post(submit_url, json=payload)
+            response.raise_for_status()
+            
+            result = response.json()
+            logger.info("Submission result: %s", result)
+            
+            is_correct = result.get("correct", False)
+            reason = result.get("reason", "")
+            next_url = result.get("url", None)
+            
+            if is_correct:
+                logger.info("✓ Answer is CORRECT!")
+            else:
+                logger.warning(f"✗ Answer is INCORRECT: {reason}")
+                if question_text:
+                    # Let a retry of this question get a fresh answer
+                    self.llm_client.forget_direct_answer(question_text)
+            
+            return next_url
+            
+        except httpx.HTTPStatusError as e:
+            logger.error(f"HTTP error submitting answer: {e}")
+            logger.error(f"Response: {e.response.text}")
+            return None
+        except Exception as e:
+            logger.error(f"Error submitting answer: {e}")
+            return None
\ No newline at end of file
@@ -2,7 +2,8 @@
 """
 Test script to verify quiz solver setup
 """
-import requests
+import asyncio
+import httpx
 import json
 import sys
 from config import EMAIL, SECRET
@@ -12,11 +13,11 @@ LOCAL_URL = "http://localhost:8000"
 DEMO_QUIZ_URL = "https://tds-llm-analysis.s-anand.net/demo"
 
 
-def test_health_check():
+async def test_health_check(client: httpx.AsyncClient):
     """Test if server is running"""
     print("Testing health check...")
     try:
-        response = requests.get(f"{LOCAL_URL}/")
+        response = await client.get("/")
         if response.status_code == 200:
             print("✓ Server is running")
             print(f"  Response: {response.json()}")
@@ -24,13 +25,13 @@ def test_health_check():
         else:
             print(f"✗ Server returned {response.status_code}")
             return False
-    except requests.exceptions.ConnectionError:
+    except httpx.ConnectError:
         print("✗ Cannot connect to server. Is it running?")
         print("  Start it with: python main.py")
         return False
 
 
-def test_invalid_secret():
+async def test_invalid_secret(client: httpx.AsyncClient):
     """Test that invalid secrets are rejected"""
     print("\nTesting invalid secret rejection...")
     payload = {
@@ -39,7 +40,7 @@ def test_invalid_secret():
         "url": DEMO_QUIZ_URL
     }
     
-    response = requests.post(f"{LOCAL_URL}/solve", json=payload)
+    response = await client.post("/solve", json=payload)
     
     if response.status_code == 403:
         print("✓ Invalid secret correctly rejected (403)")
@@ -49,13 +50,13 @@ def test_invalid_secret():
         return False
 
 
-def test_invalid_json():
+async def test_invalid_json(client: httpx.AsyncClient):
     """Test that invalid JSON is rejected"""
     print("\nTesting invalid JSON rejection...")
     
-    response = requests.post(
-        f"{LOCAL_URL}/solve",
-        data="not valid json",
+    response = await client.post(
+        "/solve",
+        content="not valid json",
         headers={"Content-Type": "application/json"}
     )
     
@@ -67,7 +68,7 @@ def test_invalid_json():
         return False
 
 
-def test_valid_request():
+async def test_valid_request(client: httpx.AsyncClient):
     """Test a valid request to the demo quiz"""
     print("\nTesting valid request with demo quiz...")
     payload = {
@@ -78,7 +79,7 @@ def test_valid_request():
     
     print(f"Sending: {json.dumps(payload, indent=2)}")
     
-    response = requests.post(f"{LOCAL_URL}/solve", json=payload)
+    response = await client.post("/solve", json=payload)
     
     print(f"Status: {response.status_code}")
     print(f"Response: {json.dumps(response.json(), indent=2)}")
@@ -92,7 +93,7 @@ def test_valid_request():
         return False
 
 
-def main():
+async def main():
     print("="*60)
     print("Quiz Solver - Test Script")
     print("="*60)
@@ -111,12 +112,17 @@ def main():
     # Run tests
     results = []
     
-    results.append(("Health Check", test_health_check()))
-    
-    if results[-1][1]:  # Only continue if server is running
-        results.append(("Invalid Secret", test_invalid_secret()))
-        results.append(("Invalid JSON", test_invalid_json()))
-        results.append(("Valid Request", test_valid_request()))
+    async with httpx.AsyncClient(base_url=LOCAL_URL, timeout=10.0) as client:
+        results.append(("Health Check", await test_health_check(client)))
+        
+        if results[-1][1]:  # Only continue if server is running
+            # The remaining tests are independent, so run them concurrently
+            outcomes = await asyncio.gather(
+                test_invalid_secret(client),
+                test_invalid_json(client),
+                test_valid_request(client)
+            )
+            results.extend(zip(["Invalid Secret", "Invalid JSON", "Valid Request"], outcomes))
     
     # Summary
     print("\n" + "="*60)
@@ -139,4 +145,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file